@@ -0,0 +1,371 @@
+import os
+import json
+import zlib
+import struct
+import calendar
+import threading
+from functools import reduce
+from math import gcd, isfinite
+from datetime import datetime, timedelta, timezone
+from betterweather import settings
+
+MAGIC = b'BWA1'
+CHUNK_HEADER = struct.Struct('>4sIqqHH')
+MAX_DECIMALS = 4
+EPOCH = datetime(1970, 1, 1)
+
+__lock = threading.Lock()
+
+
+def store_forecasts(station_id, issued_at, forecasts, definitions=None):
+    """Append a forecast run to the archive of a station
+
+    Every run is written as one self-contained, compressed chunk to an append-only file per station. The value series
+    of each element is quantised to the fewest decimals it needs and delta encoded as zigzag varints, so a single run
+    or element is decoded without touching the rest of the archive.
+    :param str station_id: The station id
+    :param datetime issued_at: The issue time of the forecast run
+    :param list[dict] forecasts: The forecasts of the run as returned by the forecast processing
+    :param dict definitions: Optional unit and description per element name
+    :return True if the run was appended, False if it was already archived or on error
+    :rtype bool
+    """
+    if not forecasts:
+        return False
+    try:
+        issued = __to_epoch(issued_at)
+        if issued in get_issue_times(station_id, as_epoch=True):
+            return False
+        chunk = __encode_run(issued, forecasts)
+        if definitions is None:
+            definitions = {
+                name: {'unit': forecast.get('unit'), 'description': forecast.get('description')}
+                for name, forecast in forecasts[0].items() if name not in ('date', 'time')
+            }
+        with __lock:
+            # checked again, a concurrent request may have stored the run in the meantime
+            chunks = list(__iter_chunks(station_id))
+            if issued in [header[2] for _, header in chunks]:
+                return False
+            end = chunks[-1][0] + CHUNK_HEADER.size + chunks[-1][1][1] if chunks else 0
+            if not __is_partial_tail(station_id, end):
+                print('Corrupt chunk at offset ' + end.__str__() + ' in forecast archive of ' + station_id +
+                      ', skipped archiving run')
+                return False
+            os.makedirs(settings.ARCHIVE_PATH, exist_ok=True)
+            with open(__get_archive_file(station_id), 'ab') as archive:
+                archive.truncate(end)
+                archive.write(chunk)
+            __update_definitions(definitions)
+        return True
+    except IOError as err_io:
+        print('IO Error while archiving forecast data: ' + err_io.__str__())
+        return False
+    except (ValueError, KeyError, TypeError, ArithmeticError, zlib.error, struct.error) as err_data:
+        print('Invalid data while archiving forecast data: ' + err_data.__repr__())
+        return False
+
+
+def get_issue_times(station_id, as_epoch=False):
+    """Get the issue times of all archived runs of a station
+
+    :param str station_id: The station id
+    :param bool as_epoch: Return seconds since epoch instead of datetime objects
+    :return The issue times in archive order, datetime objects are in UTC
+    :rtype list
+    """
+    issue_times = [header[2] for _, header in __iter_chunks(station_id)]
+    return issue_times if as_epoch else [datetime.fromtimestamp(t, timezone.utc) for t in issue_times]
+
+
+def get_forecast(station_id, timestamp, issued_at, element=None):
+    """Get an archived weather forecast
+
+    Lookup the closest weather forecast for the given time in the latest run issued at or before the given issue time
+    :param str station_id: The station id
+    :param float timestamp: The time for the forecast as Unix timestamp
+    :param float issued_at: The issue time of the run as Unix timestamp
+    :param str element: Only decode this element instead of the whole forecast
+    :return A weather forecast or False if no run is archived or the element is not part of the run
+    :rtype dict or bool
+    """
+    run = __find_run(station_id, int(issued_at))
+    if not run:
+        return False
+    header, steps, index, body = run
+    if element and element.lower() not in index:
+        return False
+    target = int(timestamp)
+    i = min(range(len(steps)), key=lambda k: abs(steps[k] - target))
+    definitions = __load_definitions()
+    names = [element.lower()] if element else list(index)
+
+    forecast = dict()
+    forecast['date'] = {
+        'value': __from_epoch(steps[i]).date(),
+        'unit': None,
+        'description': 'Date of forecast'
+    }
+    forecast['time'] = {
+        'value': __from_epoch(steps[i]).time(),
+        'unit': None,
+        'description': 'Time of forecast'
+    }
+    forecast['issued_at'] = {
+        'value': datetime.fromtimestamp(header[2], timezone.utc),
+        'unit': None,
+        'description': 'Issue time of forecast (UTC)'
+    }
+    for name in names:
+        start, decimals, step, length = index[name]
+        series = __decode_series(body[start:start + length], decimals, step) if length else [None] * len(steps)
+        forecast[name] = {
+            'value': series[i],
+            'unit': definitions.get(name, {}).get('unit'),
+            'description': definitions.get(name, {}).get('description')
+        }
+    return forecast
+
+
+def __encode_run(issued, forecasts):
+    """Encode a forecast run as archive chunk
+
+    The chunk body holds the timestep deltas, the element index and the element payloads as one deflate stream.
+    :param int issued: The issue time of the forecast run in seconds since epoch
+    :param list[dict] forecasts: The forecasts of the run
+    :return The encoded chunk
+    :rtype bytes
+    """
+    steps = [__to_epoch(datetime.combine(f['date']['value'], f['time']['value'])) for f in forecasts]
+    names = [name for name in forecasts[0] if name not in ('date', 'time')]
+
+    index = bytearray(b''.join(__encode_varint(b - a) for a, b in zip(steps, steps[1:])))
+    payloads = list()
+    for name in names:
+        decimals, step, payload = __encode_series([f[name]['value'] for f in forecasts])
+        encoded_name = name.encode('ascii')
+        index += __encode_varint(len(encoded_name)) + encoded_name
+        index += __encode_varint(decimals) + __encode_varint(step) + __encode_varint(len(payload))
+        payloads.append(payload)
+    body = zlib.compress(bytes(index) + b''.join(payloads), 9)
+    return CHUNK_HEADER.pack(MAGIC, len(body), issued, steps[0], len(steps), len(names)) + body
+
+
+def __find_run(station_id, issued):
+    """Find the latest run issued at or before the given time
+
+    :param str station_id: The station id
+    :param int issued: The issue time in seconds since epoch
+    :return Chunk header, timesteps, element index and decompressed chunk body or False if there is no such run
+    :rtype tuple or bool
+    """
+    best = None
+    for offset, header in __iter_chunks(station_id):
+        if header[2] <= issued and (best is None or header[2] >= best[1][2]):
+            best = (offset, header)
+    if best is None:
+        return False
+    offset, header = best
+    with open(__get_archive_file(station_id), 'rb') as archive:
+        archive.seek(offset + CHUNK_HEADER.size)
+        body = archive.read(header[1])
+    try:
+        body = zlib.decompress(body)
+        steps = [header[3]]
+        pos = 0
+        for _ in range(header[4] - 1):
+            delta, pos = __read_varint(body, pos)
+            steps.append(steps[-1] + delta)
+        entries = list()
+        for _ in range(header[5]):
+            name_length, pos = __read_varint(body, pos)
+            name = body[pos:pos + name_length].decode('ascii')
+            decimals, pos = __read_varint(body, pos + name_length)
+            step, pos = __read_varint(body, pos)
+            length, pos = __read_varint(body, pos)
+            entries.append((name, decimals, step, length))
+    except (ValueError, IndexError, zlib.error) as err_data:
+        print('Invalid chunk in forecast archive of ' + station_id + ': ' + err_data.__repr__())
+        return False
+    index = dict()
+    for name, decimals, step, length in entries:
+        index[name] = (pos, decimals, step, length)
+        pos += length
+    return header, steps, index, body
+
+
+def __iter_chunks(station_id):
+    """Iterate over the chunk headers of the station archive
+
+    Only the fixed size headers are read, the chunk bodies are skipped. An invalid or truncated chunk ends the
+    iteration.
+    :param str station_id: The station id
+    :return Generator of chunk offset and unpacked header
+    :rtype generator
+    """
+    archive_file = __get_archive_file(station_id)
+    if not os.path.isfile(archive_file):
+        return
+    size = os.path.getsize(archive_file)
+    with open(archive_file, 'rb') as archive:
+        offset = 0
+        while offset + CHUNK_HEADER.size <= size:
+            archive.seek(offset)
+            header = CHUNK_HEADER.unpack(archive.read(CHUNK_HEADER.size))
+            if header[0] != MAGIC or offset + CHUNK_HEADER.size + header[1] > size:
+                return
+            yield offset, header
+            offset += CHUNK_HEADER.size + header[1]
+
+
+def __is_partial_tail(station_id, end):
+    """Check whether the archive data behind the last valid chunk may be cut off
+
+    Only a chunk left incomplete by an interrupted write may be cut off, that is a header shorter than its fixed size
+    or a valid header with a short body. Any other data behind the last valid chunk is treated as corruption.
+    :param str station_id: The station id
+    :param int end: The end of the last valid chunk
+    :return True if there is no data or only a partial chunk behind the last valid chunk
+    :rtype bool
+    """
+    archive_file = __get_archive_file(station_id)
+    size = os.path.getsize(archive_file) if os.path.isfile(archive_file) else 0
+    if size - end < CHUNK_HEADER.size:
+        return True
+    with open(archive_file, 'rb') as archive:
+        archive.seek(end)
+        header = CHUNK_HEADER.unpack(archive.read(CHUNK_HEADER.size))
+    return header[0] == MAGIC and end + CHUNK_HEADER.size + header[1] > size
+
+
+def __encode_series(values):
+    """Quantise and delta encode a value series
+
+    The values are scaled to integers by the fewest decimals needed and the deltas between defined values are divided
+    by their greatest common divisor. A varint of 0 marks an undefined value, all other varints are the zigzag encoded
+    first value or delta plus one. A series without any defined value is stored with an empty payload.
+    :param list values: The float values, None for undefined values
+    :return The number of decimals, the delta divisor and the encoded payload
+    :rtype tuple
+    """
+    defined = [v for v in values if v is not None]
+    if not defined:
+        return 0, 1, b''
+    if not all(isfinite(v) for v in defined):
+        raise ValueError('non-finite value in series')
+    decimals = next(
+        (n for n in range(MAX_DECIMALS) if all(round(v * 10 ** n) / 10 ** n == v for v in defined)),
+        MAX_DECIMALS
+    )
+    quantised = [round(v * 10 ** decimals) for v in defined]
+    step = reduce(gcd, (b - a for a, b in zip(quantised, quantised[1:])), 0) or 1
+    encoded = bytearray()
+    last = None
+    for v in values:
+        if v is None:
+            encoded += b'\x00'
+            continue
+        q = round(v * 10 ** decimals)
+        delta = q if last is None else (q - last) // step
+        encoded += __encode_varint((delta * 2 if delta >= 0 else -delta * 2 - 1) + 1)
+        last = q
+    return decimals, step, bytes(encoded)
+
+
+def __decode_series(payload, decimals, step):
+    """Decode a value series encoded by __encode_series
+
+    :param bytes payload: The encoded payload
+    :param int decimals: The number of decimals used for quantisation
+    :param int step: The divisor of the deltas
+    :return The float values, None for undefined values
+    :rtype list
+    """
+    values = []
+    last = None
+    scale = 10 ** decimals
+    for v in __decode_varints(payload):
+        if v == 0:
+            values.append(None)
+            continue
+        v -= 1
+        delta = -(v + 1) // 2 if v & 1 else v // 2
+        last = delta if last is None else last + delta * step
+        values.append(last / scale)
+    return values
+
+
+def __encode_varint(value):
+    encoded = bytearray()
+    while value > 0x7f:
+        encoded.append((value & 0x7f) | 0x80)
+        value >>= 7
+    encoded.append(value)
+    return bytes(encoded)
+
+
+def __read_varint(data, pos):
+    value = 0
+    shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7f) << shift
+        if not byte & 0x80:
+            return value, pos
+        shift += 7
+
+
+def __decode_varints(data):
+    values = []
+    value = 0
+    shift = 0
+    for byte in data:
+        value |= (byte & 0x7f) << shift
+        if byte & 0x80:
+            shift += 7
+        else:
+            values.append(value)
+            value = 0
+            shift = 0
+    return values
+
+
+def __load_definitions():
+    definition_file = os.path.join(settings.ARCHIVE_PATH, 'definitions.json')
+    if not os.path.isfile(definition_file):
+        return {}
+    try:
+        with open(definition_file, 'r') as definitions:
+            return json.load(definitions)
+    except ValueError as err_value:
+        print('Invalid element definitions in archive: ' + err_value.__str__())
+        return {}
+
+
+def __update_definitions(definitions):
+    """Merge element units and descriptions into the archive wide definitions
+
+    The definitions are kept once per archive instead of once per run.
+    :param dict definitions: Unit and description per element name
+    """
+    stored = __load_definitions()
+    if all(stored.get(name) == definition for name, definition in definitions.items()):
+        return
+    stored.update(definitions)
+    definition_file = os.path.join(settings.ARCHIVE_PATH, 'definitions.json')
+    with open(definition_file + '.tmp', 'w') as tmp:
+        json.dump(stored, tmp)
+    os.replace(definition_file + '.tmp', definition_file)
+
+
+def __get_archive_file(station_id):
+    return os.path.join(settings.ARCHIVE_PATH, station_id.upper() + '.bwa')
+
+
+def __to_epoch(d):
+    return calendar.timegm(d.utctimetuple())
+
+
+def __from_epoch(seconds):
+    return EPOCH + timedelta(seconds=seconds)
@@ -1,9 +1,9 @@
 import os
 import socket
 import click
-from flask import Flask, jsonify, render_template
+from flask import Flask, jsonify, render_template, request
 from datetime import datetime
-from betterweather import stations, forecasts
+from betterweather import stations, forecasts, archive
 
 
 app = Flask(__name__)
@@ -47,6 +47,14 @@ def forecastdata_print_command(station_id, forecast_date):
     print(forecast)
 
 
+@app.cli.command('archive_runs')
+@click.argument('station_id')
+def archive_runs_command(station_id):
+    """Print issue times of archived forecast runs for weather station"""
+    for issued_at in archive.get_issue_times(station_id):
+        print(issued_at.isoformat())
+
+
 @app.cli.command('weathercode_print')
 @click.argument('key_number')
 def weathercode_print_command(key_number):
@@ -97,6 +105,11 @@ def config_apache_command(server_name):
 @app.route('/forecast/station/<station_id>/', defaults={'timestamp': datetime.now().timestamp()})
 @app.route('/forecast/station/<station_id>/<int:timestamp>')
 def get_forecast_by_station(station_id, timestamp):
+    if 'issued_at' in request.args:
+        issued_at = request.args.get('issued_at', type=int)
+        if issued_at is None:
+            return jsonify(False)
+        return get_archived_forecast_by_station(station_id, timestamp, issued_at, request.args.get('element'))
     forecast = forecasts.get_forecast(station_id, timestamp)
     station = stations.get_station(station_id)
     if forecast:
@@ -107,6 +120,18 @@ def get_forecast_by_station(station_id, timestamp):
     return jsonify(forecast)
 
 
+def get_archived_forecast_by_station(station_id, timestamp, issued_at, element):
+    forecast = archive.get_forecast(station_id, timestamp, issued_at, element)
+    if forecast:
+        forecast['date']['value'] = forecast['date']['value'].isoformat()
+        forecast['time']['value'] = forecast['time']['value'].isoformat()
+        forecast['issued_at']['value'] = forecast['issued_at']['value'].isoformat()
+        if not element:
+            forecast['station'] = stations.get_station(station_id)
+            forecast['present_weather'] = forecasts.get_present_weather(forecast.get('ww', {}).get('value'))
+    return jsonify(forecast)
+
+
 @app.route('/forecast/location/<float:latitude>/<float:longitude>/', defaults={'timestamp': datetime.now().timestamp()})
 @app.route('/forecast/location/<float:latitude>/<float:longitude>/<int:timestamp>')
 def get_forecast_by_location(latitude, longitude, timestamp):
@@ -2,10 +2,11 @@ import os
 import zipfile
 import ssl
 import tempfile
+from math import isfinite
 from datetime import datetime
 from urllib import request, error
 from xml.etree import cElementTree as ElementTree
-from betterweather import settings
+from betterweather import settings, archive
 
 KML_NS = {
     'kml': "http://www.opengis.net/kml/2.2",
@@ -15,6 +16,40 @@ KML_NS = {
     'atom': "http://www.w3.org/2005/Atom"
 }
 
+__WEATHERCODE_DESCRIPTIONS = {
+    95: """slight or moderate thunderstorm with rain or snow""",
+    57: """Drizzle, freezing, moderate or heavy (dence)""",
+    56: """Drizzle, freezing, slight""",
+    67: """Rain, freezing, moderate or heavy (dence)""",
+    66: """Rain, freezing, slight""",
+    86: """Snow shower(s), moderate or heavy""",
+    85: """Snow shower(s), slight""",
+    84: """Shower(s) of rain and snow mixed, moderate or heavy""",
+    83: """Shower(s) of rain and snow mixed, slight""",
+    82: """extremely heavy rain shower""",
+    81: """moderate or heavy rain showers""",
+    80: """slight rain shower""",
+    75: """heavy snowfall, continuous""",
+    73: """moderate snowfall, continuous""",
+    71: """slight snowfall, continuous""",
+    69: """moderate or heavy rain and snow""",
+    68: """slight rain and snow""",
+    55: """heavy drizzle, not freezing, continuous""",
+    53: """moderate drizzle, not freezing, continuous""",
+    51: """slight drizzle, not freezing, continuous""",
+    65: """heavy rain, not freezing, continuous""",
+    63: """moderate rain, not freezing, continuous""",
+    61: """slight rain, not freezing, continuous""",
+    49: """Ice Fog, sky not recognizable""",
+    45: """Fog, sky not recognizable""",
+    3: """Effective cloud cover at least 7 / 8""",
+    2: """Effective cloud cover between 4.6 / 8 and 6 / 8""",
+    1: """Effective cloud cover between 1 / 8 and 4.5 / 8""",
+    0: """Effective cloud cover less than 1 / 8"""
+}
+
+WEATHER_CODES = tuple(__WEATHERCODE_DESCRIPTIONS.get(code, "") for code in range(100))
+
 
 def get_forecast(station_id, timestamp):
     """Get weather forecast
@@ -44,6 +79,7 @@ def get_forecast(station_id, timestamp):
             os.unlink(remote_files[0])
             os.unlink(remote_files[1])
             os.unlink('/tmp/' + file_name)
+            __archive_forecasts(station_id, kml_root, forecasts)
             return s[0]
         return False
     except IOError as err_io:
@@ -72,6 +108,7 @@ def get_daily_trend(station_id, date):
             os.unlink(remote_files[0])
             os.unlink(remote_files[1])
             os.unlink('/tmp/' + file_name)
+            __archive_forecasts(station_id, kml_root, forecasts)
             return list(f)
         return False
     except IOError as err_io:
@@ -95,6 +132,7 @@ def get_weekly_trend(station_id):
             os.unlink(remote_files[0])
             os.unlink(remote_files[1])
             os.unlink('/tmp/' + file_name)
+            __archive_forecasts(station_id, kml_root, forecasts)
             return forecasts
         return False
     except IOError as err_io:
@@ -103,7 +141,17 @@ def get_weekly_trend(station_id):
 
 
 def get_present_weather(code):
-    return __get_all_weathercodes().get(code, "")
+    """Get the description of a present weather code
+
+    :param code: The weather code (ww) as number
+    :type code: int or float
+    :return: The description or an empty string for unknown codes
+    :rtype: str
+    """
+    if not isinstance(code, (int, float)) or not isfinite(code) or code != int(code) \
+            or not 0 <= code < len(WEATHER_CODES):
+        return ""
+    return WEATHER_CODES[int(code)]
 
 
 def __get_remote_files(station_id):
@@ -141,38 +189,23 @@ def __get_remote_files(station_id):
         return False
 
 
-def __get_all_weathercodes():
-    return {
-        95: """slight or moderate thunderstorm with rain or snow""",
-        57: """Drizzle, freezing, moderate or heavy (dence)""",
-        56: """Drizzle, freezing, slight""",
-        67: """Rain, freezing, moderate or heavy (dence)""",
-        66: """Rain, freezing, slight""",
-        86: """Snow shower(s), moderate or heavy""",
-        85: """Snow shower(s), slight""",
-        84: """Shower(s) of rain and snow mixed, moderate or heavy""",
-        83: """Shower(s) of rain and snow mixed, slight""",
-        82: """extremely heavy rain shower""",
-        81: """moderate or heavy rain showers""",
-        80: """slight rain shower""",
-        75: """heavy snowfall, continuous""",
-        73: """moderate snowfall, continuous""",
-        71: """slight snowfall, continuous""",
-        69: """moderate or heavy rain and snow""",
-        68: """slight rain and snow""",
-        55: """heavy drizzle, not freezing, continuous""",
-        53: """moderate drizzle, not freezing, continuous""",
-        51: """slight drizzle, not freezing, continuous""",
-        65: """heavy rain, not freezing, continuous""",
-        63: """moderate rain, not freezing, continuous""",
-        61: """slight rain, not freezing, continuous""",
-        49: """Ice Fog, sky not recognizable""",
-        45: """Fog, sky not recognizable""",
-        3: """Effective cloud cover at least 7 / 8""",
-        2: """Effective cloud cover between 4.6 / 8 and 6 / 8""",
-        1: """Effective cloud cover between 1 / 8 and 4.5 / 8""",
-        0: """Effective cloud cover less than 1 / 8"""
-    }
+def __archive_forecasts(station_id, kml, forecasts):
+    """Keep the processed forecast run in the historical archive
+
+    Archive failures are only reported, they never affect serving the current forecast.
+    :param str station_id: The station id
+    :param kml: The kml root
+    :param list[dict] forecasts: The processed forecasts
+    """
+    issue_time = kml.find('.//dwd:IssueTime', KML_NS)
+    if issue_time is None:
+        return
+    try:
+        issued_at = datetime.strptime(issue_time.text, '%Y-%m-%dT%H:%M:%S.000Z')
+    except (ValueError, TypeError) as err_value:
+        print('Invalid issue time while archiving forecast data: ' + err_value.__str__())
+        return
+    archive.store_forecasts(station_id, issued_at, forecasts)
 
 
 def __process_kml(kml, definitions):
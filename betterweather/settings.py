@@ -1,3 +1,4 @@
 STATIONS_URL = "https://www.dwd.de/EN/ourservices/met_application_mosmix/mosmix_stations.cfg?view=nasPublication"
 FORECASTS_URL = 'https://opendata.dwd.de/weather/local_forecasts/mos/MOSMIX_L/single_stations/'
 DEFINITION_URL = 'https://opendata.dwd.de/weather/lib/MetElementDefinition.xml'
+ARCHIVE_PATH = '/var/lib/betterweather/archive'
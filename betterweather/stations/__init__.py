@@ -3,6 +3,7 @@ import tempfile
 from math import sin, cos, sqrt, atan2, radians
 from urllib import request, error
 from betterweather import settings
+from betterweather.stations.parser import parse_stations, parse_stations_csv
 
 R = 6373.0
 
@@ -40,35 +41,39 @@ def get_nearest_station(latitude, longitude):
     return False
 
 
+def import_stations_from_csv(csv_file):
+    """Get weather stations from a station catalog in csv format
+
+    :param str csv_file: The path to the csv file
+    :return: List of weather station information or False on error
+    :rtype: list[dict] or bool
+    """
+    try:
+        with open(csv_file, 'r', encoding='utf-8', newline='') as station_list:
+            all_stations, bad_lines = parse_stations_csv(station_list)
+        for number, reason in bad_lines:
+            print('Skipped invalid station data in line ' + number.__str__() + ': ' + reason)
+        return all_stations
+    except IOError as err_io:
+        print('IO Error while reading station data: ' + err_io.__str__())
+        return False
+
+
 def __get_all_stations():
     """Get all available weather stations
 
     :return: List of weather station information or False on error
     :rtype: list[dict] or bool
     """
-    all_stations = list()
     try:
         with tempfile.TemporaryFile() as station_list:
             gcontext = ssl._create_unverified_context()
             with request.urlopen(settings.STATIONS_URL, context=gcontext) as u:
                 station_list.write(u.read())
             station_list.seek(0)
-            for line in station_list.readlines():
-                line = line.decode('latin-1')
-                if len(line) >= 75 and line[12:12 + 5].strip() != 'id' and line[12:12 + 5] != '=====':
-                    lat = float(line[44:44 + 6].split('.')[0]) + float(line[44:44 + 6].split('.')[1]) / 60
-                    lon = float(line[51:51 + 7].split('.')[0]) + float(line[51:51 + 7].split('.')[1]) / 60
-                    all_stations.append(
-                        {
-                            'id': line[12:12 + 5].strip(),
-                            'ICAO': line[18:18 + 4] if line[18:18 + 4] != '----' else None,
-                            'name': line[23:23 + 20].strip(),
-                            'latitude': lat,
-                            'longitude': lon,
-                            'altitude': int(line[59:59 + 5]),
-                            'type': line[72:72 + 4]
-                        }
-                    )
+            all_stations, bad_lines = parse_stations(station_list)
+        for number, reason in bad_lines:
+            print('Skipped invalid station data in line ' + number.__str__() + ': ' + reason)
         return all_stations
     except error.HTTPError as err_http:
         print('HTTP Error while retrieving station data: ' + err_http.__str__())
@@ -0,0 +1,102 @@
+import re
+import csv
+import struct
+
+STATION_LINE = struct.Struct('12x5sx4sx20sx6sx7sx5s8x4s')
+CSV_POSITION = re.compile(r'^\s*(-?\d+(?:,\d+)?)\s+(-?\d+(?:,\d+)?)\s*$')
+CSV_MINUS = '‐'
+CSV_PAGE_FOOTER = re.compile(r'^\d+\s*von$')
+
+
+def parse_stations(lines):
+    """Parse the fixed width MOSMIX station catalog
+
+    Every line is unpacked in a single pass over the raw bytes. Header, separator and short lines are skipped, lines
+    with malformed values are reported instead of aborting the whole catalog.
+    :param lines: The raw lines of the station catalog
+    :type lines: iterable[bytes]
+    :return: List of weather station information and list of line number and reason of bad lines
+    :rtype: tuple
+    """
+    stations = list()
+    errors = list()
+    for number, line in enumerate(lines, 1):
+        if len(line) < 75:
+            continue
+        station_id, icao, name, lat, lon, altitude, station_type = STATION_LINE.unpack(line[:76].ljust(76))
+        if station_id.strip() == b'id' or station_id == b'=====':
+            continue
+        try:
+            station = {
+                'id': station_id.decode('latin-1').strip(),
+                'ICAO': icao.decode('latin-1') if icao != b'----' else None,
+                'name': name.decode('latin-1').strip(),
+                'latitude': __parse_degrees_minutes(lat),
+                'longitude': __parse_degrees_minutes(lon),
+                'altitude': int(altitude),
+                'type': station_type.decode('latin-1').strip()
+            }
+        except ValueError as err_value:
+            errors.append((number, err_value.__str__()))
+            continue
+        stations.append(station)
+    return stations, errors
+
+
+def parse_stations_csv(lines):
+    """Parse the MOSMIX station catalog in csv format
+
+    The csv catalog holds the station id and name in the first, the position in decimal degrees with decimal commas
+    in the second and the altitude in the third column. Page headers and footers are skipped, rows with malformed
+    values are reported.
+    :param lines: The decoded lines of the station catalog
+    :type lines: iterable[str]
+    :return: List of weather station information and list of line number and reason of bad lines
+    :rtype: tuple
+    """
+    stations = list()
+    errors = list()
+    reader = csv.reader(lines)
+    for row in reader:
+        number = reader.line_num
+        if len(row) < 2 or row[0] == 'MOSMIX' or row[0].startswith('Stations') or row[1] == 'von' \
+                or CSV_PAGE_FOOTER.match(row[0]):
+            continue
+        station_id, _, name = row[0].partition(' ')
+        position = CSV_POSITION.match(row[1].replace(CSV_MINUS, '-'))
+        altitude = row[2].replace(CSV_MINUS, '-').strip() if len(row) > 2 else ''
+        if not station_id or not name.strip():
+            errors.append((number, 'missing station id or name'))
+            continue
+        if not position:
+            errors.append((number, 'invalid position ' + repr(row[1])))
+            continue
+        try:
+            stations.append(
+                {
+                    'id': station_id,
+                    'ICAO': None,
+                    'name': name.strip(),
+                    'latitude': float(position.group(1).replace(',', '.')),
+                    'longitude': float(position.group(2).replace(',', '.')),
+                    'altitude': int(altitude) if altitude else None,
+                    'type': None
+                }
+            )
+        except ValueError as err_value:
+            errors.append((number, err_value.__str__()))
+    return stations, errors
+
+
+def __parse_degrees_minutes(value):
+    """Convert a position formatted degrees.minutes to decimal degrees
+
+    :param bytes value: The position field
+    :return: The position in decimal degrees
+    :rtype: float
+    """
+    degrees, separator, minutes = value.strip().partition(b'.')
+    if not separator:
+        raise ValueError('invalid position ' + repr(value.decode('latin-1')))
+    decimal = abs(float(degrees)) + float(minutes) / 60
+    return -decimal if degrees.startswith(b'-') else decimal
@@ -0,0 +1,210 @@
+import os
+import math
+import time
+import random
+import calendar
+import tempfile
+import unittest
+from unittest import mock
+from datetime import datetime, timedelta, timezone
+from betterweather import archive, settings
+
+
+def epoch(d):
+    return calendar.timegm(d.utctimetuple())
+
+
+def create_forecasts(start, offset=0.0):
+    forecasts = []
+    for i in range(240):
+        d = start + timedelta(hours=i)
+        forecasts.append({
+            'date': {'value': d.date(), 'unit': None, 'description': 'Date of forecast'},
+            'time': {'value': d.time(), 'unit': None, 'description': 'Time of forecast'},
+            'ttt': {'value': round(273.15 + offset + (i % 24) * 0.35, 2), 'unit': 'K', 'description': 'Temperature'},
+            'pppp': {'value': 101300.0 - i * 10, 'unit': 'Pa', 'description': 'Surface pressure'},
+            'ww': {'value': float(i % 4) if i % 5 else None, 'unit': None, 'description': 'Significant Weather'},
+            'rrl1c': {'value': None, 'unit': 'kg / m2', 'description': 'Total precipitation'}
+        })
+    return forecasts
+
+
+def create_mosmix_run(start, seed=0):
+    """Create a run shaped like MOSMIX_L with 115 elements over 240 hourly timesteps"""
+    rnd = random.Random(seed)
+    series = dict()
+    for n in range(115):
+        kind = n % 8
+        level = rnd.uniform(0, 100)
+        values = []
+        for i in range(240):
+            if kind in (0, 1):
+                # temperatures in K with 0.1 degree resolution and a diurnal cycle
+                values.append(round(273.15 + round(level / 10 + 6 * math.sin((i - 9) * math.pi / 12) - i / 60, 1), 2))
+            elif kind in (2, 3, 4):
+                # probabilities in percent changing every few hours
+                if rnd.random() < 0.3:
+                    level = min(100, max(0, level + rnd.randint(-5, 5)))
+                values.append(float(round(level)))
+            elif kind == 5:
+                # wind speeds in m/s converted from knots
+                level = max(0.0, min(20.0, level / 10 if i == 0 else level + rnd.uniform(-0.4, 0.4)))
+                values.append(round(round(level * 1.94384) / 1.94384, 2))
+            elif kind == 6:
+                # six-hourly extremes
+                values.append(round(285.15 + rnd.uniform(-3, 3), 1) if i % 6 == 5 else None)
+            else:
+                # hourly amounts only available for the first days
+                values.append(round(max(0.0, rnd.uniform(-4, 1)), 1) if i < 120 else None)
+        series['e{:03d}'.format(n)] = values
+    forecasts = []
+    for i in range(240):
+        d = start + timedelta(hours=i)
+        forecast = {
+            'date': {'value': d.date(), 'unit': None, 'description': 'Date of forecast'},
+            'time': {'value': d.time(), 'unit': None, 'description': 'Time of forecast'}
+        }
+        for name, values in series.items():
+            forecast[name] = {'value': values[i], 'unit': None, 'description': name}
+        forecasts.append(forecast)
+    return forecasts
+
+
+class ArchiveTest(unittest.TestCase):
+    def setUp(self):
+        self.archive_path = settings.ARCHIVE_PATH
+        self.temp_dir = tempfile.TemporaryDirectory()
+        settings.ARCHIVE_PATH = self.temp_dir.name
+        self.first_issue = datetime(2018, 7, 20, 3, tzinfo=timezone.utc)
+        self.second_issue = datetime(2018, 7, 20, 9, tzinfo=timezone.utc)
+        self.first_run = create_forecasts(datetime(2018, 7, 20, 4))
+        self.second_run = create_forecasts(datetime(2018, 7, 20, 10), offset=1.5)
+        archive.store_forecasts('10865', self.first_issue, self.first_run)
+        archive.store_forecasts('10865', self.second_issue, self.second_run)
+
+    def tearDown(self):
+        settings.ARCHIVE_PATH = self.archive_path
+        self.temp_dir.cleanup()
+
+    def test_issue_times(self):
+        self.assertEqual(archive.get_issue_times('10865'), [self.first_issue, self.second_issue])
+
+    def test_duplicate_run(self):
+        with mock.patch.object(archive, '__encode_run') as encode_run:
+            self.assertFalse(archive.store_forecasts('10865', self.first_issue, self.first_run))
+        encode_run.assert_not_called()
+        self.assertEqual(len(archive.get_issue_times('10865')), 2)
+
+    def test_roundtrip(self):
+        for issue, run in ((self.first_issue, self.first_run), (self.second_issue, self.second_run)):
+            for expected in run[::7]:
+                d = datetime.combine(expected['date']['value'], expected['time']['value'])
+                forecast = archive.get_forecast('10865', epoch(d), epoch(issue))
+                self.assertEqual(forecast['issued_at']['value'], issue)
+                for name in expected:
+                    self.assertEqual(forecast[name], expected[name])
+
+    def test_time_travel(self):
+        d = datetime(2018, 7, 21, 12)
+        before = archive.get_forecast('10865', epoch(d), epoch(self.second_issue - timedelta(hours=1)))
+        after = archive.get_forecast('10865', epoch(d), epoch(self.second_issue + timedelta(hours=1)))
+        self.assertEqual(before['issued_at']['value'], self.first_issue)
+        self.assertEqual(after['issued_at']['value'], self.second_issue)
+        self.assertFalse(archive.get_forecast('10865', epoch(d), epoch(self.first_issue) - 1))
+
+    def test_time_travel_local_timezone(self):
+        tz = os.environ.get('TZ')
+        os.environ['TZ'] = 'Europe/Berlin'
+        time.tzset()
+        try:
+            d = datetime(2018, 7, 21, 12)
+            forecast = archive.get_forecast('10865', epoch(d), epoch(datetime(2018, 7, 20, 8)))
+            self.assertEqual(forecast['issued_at']['value'], self.first_issue)
+            self.assertEqual(forecast['time']['value'], d.time())
+        finally:
+            if tz is None:
+                del os.environ['TZ']
+            else:
+                os.environ['TZ'] = tz
+            time.tzset()
+
+    def test_corrupt_header(self):
+        archive_file = os.path.join(settings.ARCHIVE_PATH, '10865.bwa')
+        third_issue = datetime(2018, 7, 20, 15, tzinfo=timezone.utc)
+        with open(archive_file, 'rb') as f:
+            data = f.read()
+        second_offset = archive.CHUNK_HEADER.size + archive.CHUNK_HEADER.unpack_from(data)[1]
+        for offset in (0, second_offset):
+            corrupt = data[:offset] + b'XXXX' + data[offset + 4:]
+            with open(archive_file, 'wb') as f:
+                f.write(corrupt)
+            self.assertFalse(archive.store_forecasts('10865', third_issue, create_forecasts(datetime(2018, 7, 20, 16))))
+            with open(archive_file, 'rb') as f:
+                self.assertEqual(f.read(), corrupt)
+
+    def test_corrupt_definitions(self):
+        with open(os.path.join(settings.ARCHIVE_PATH, 'definitions.json'), 'w') as f:
+            f.write('{"ttt": ')
+        third_issue = datetime(2018, 7, 20, 15, tzinfo=timezone.utc)
+        self.assertTrue(archive.store_forecasts('10865', third_issue, create_forecasts(datetime(2018, 7, 20, 16))))
+        forecast = archive.get_forecast('10865', epoch(datetime(2018, 7, 21, 12)), epoch(third_issue))
+        self.assertEqual(forecast['ttt']['unit'], 'K')
+
+    def test_invalid_forecasts(self):
+        forecasts = create_forecasts(datetime(2018, 7, 20, 16))
+        forecasts[3]['ttt']['value'] = 'n/a'
+        self.assertFalse(archive.store_forecasts('10865', datetime(2018, 7, 20, 15), forecasts))
+        self.assertEqual(len(archive.get_issue_times('10865')), 2)
+
+    def test_non_finite_forecasts(self):
+        for value in (float('inf'), float('-inf'), float('nan'), 1e308):
+            forecasts = create_forecasts(datetime(2018, 7, 20, 16))
+            forecasts[3]['ttt']['value'] = value
+            self.assertFalse(archive.store_forecasts('10865', datetime(2018, 7, 20, 15), forecasts))
+        self.assertEqual(len(archive.get_issue_times('10865')), 2)
+
+    def test_single_element(self):
+        d = datetime(2018, 7, 21, 12)
+        forecast = archive.get_forecast('10865', epoch(d), epoch(self.second_issue), element='TTT')
+        self.assertEqual(set(forecast), {'date', 'time', 'issued_at', 'ttt'})
+        self.assertEqual(forecast['ttt']['unit'], 'K')
+
+    def test_unknown_element(self):
+        d = datetime(2018, 7, 21, 12)
+        self.assertFalse(archive.get_forecast('10865', epoch(d), epoch(self.second_issue), element='XYZ'))
+
+    def test_size(self):
+        size = os.path.getsize(os.path.join(settings.ARCHIVE_PATH, '10865.bwa'))
+        self.assertLess(size / len(archive.get_issue_times('10865')), 1024)
+
+    def test_size_mosmix_run(self):
+        runs = list()
+        for n in range(4):
+            issue = datetime(2018, 7, 20, 3 + n * 6, tzinfo=timezone.utc)
+            runs.append((issue, create_mosmix_run(datetime(2018, 7, 20, 4 + n * 6), seed=n)))
+            self.assertTrue(archive.store_forecasts('P0489', issue, runs[-1][1]))
+        size = os.path.getsize(os.path.join(settings.ARCHIVE_PATH, 'P0489.bwa'))
+        self.assertLess(size / len(archive.get_issue_times('P0489')), 8 * 1024)
+        issue, run = runs[2]
+        for expected in run[::13]:
+            d = datetime.combine(expected['date']['value'], expected['time']['value'])
+            forecast = archive.get_forecast('P0489', epoch(d), epoch(issue))
+            for name in expected:
+                self.assertEqual(forecast[name]['value'], expected[name]['value'])
+
+    def test_truncated_chunk(self):
+        archive_file = os.path.join(settings.ARCHIVE_PATH, '10865.bwa')
+        with open(archive_file, 'ab') as f:
+            f.write(archive.MAGIC + b'\x00\x00\xff\xff')
+        self.assertEqual(len(archive.get_issue_times('10865')), 2)
+        third_issue = datetime(2018, 7, 20, 15, tzinfo=timezone.utc)
+        self.assertTrue(archive.store_forecasts('10865', third_issue, create_forecasts(datetime(2018, 7, 20, 16))))
+        self.assertFalse(archive.store_forecasts('10865', third_issue, create_forecasts(datetime(2018, 7, 20, 16))))
+        self.assertEqual(archive.get_issue_times('10865'), [self.first_issue, self.second_issue, third_issue])
+        d = datetime(2018, 7, 21, 12)
+        forecast = archive.get_forecast('10865', epoch(d), epoch(third_issue))
+        self.assertEqual(forecast['issued_at']['value'], third_issue)
+
+
+if __name__ == '__main__':
+    unittest.main()
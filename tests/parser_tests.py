@@ -0,0 +1,101 @@
+import os
+import unittest
+from betterweather import forecasts
+from betterweather.stations.parser import parse_stations, parse_stations_csv
+
+TESTDATA = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'testdata')
+
+
+def station_line(station_id, icao, name, lat, lon, altitude, station_type):
+    return '{:12}{:5} {:4} {:20} {:>6} {:>7} {:>5}{:8}{:4}\n'.format(
+        '', station_id, icao, name, lat, lon, altitude, '', station_type
+    ).encode('latin-1')
+
+
+CATALOG = [
+    b'MOSMIX station catalog\n',
+    '{:12}{:5} {:4} {:20}'.format('', 'id', 'ICAO', 'name').ljust(75).encode('latin-1') + b'\n',
+    '{:12}{:5}'.format('', '=====').ljust(75, '=').encode('latin-1') + b'\n',
+    station_line('10865', 'EDDM', 'MUENCHEN/FLUGHAFEN', '48.21', '11.47', '446', 'LAND'),
+    station_line('10382', 'EDDT', 'BERLIN-TEGEL', '52.34', '13.19', '36', 'LAND'),
+    station_line('01311', '----', 'BERGEN', '60.18', '5.13', '50', 'LAND'),
+    station_line('10147', 'EDDH', 'HAMBURG-FUHLSB\xdcTTEL', '53.38', '10.00', '16', 'LAND'),
+]
+
+
+def legacy_parse_stations(lines):
+    all_stations = list()
+    for line in lines:
+        line = line.decode('latin-1')
+        if len(line) >= 75 and line[12:12 + 5].strip() != 'id' and line[12:12 + 5] != '=====':
+            lat = float(line[44:44 + 6].split('.')[0]) + float(line[44:44 + 6].split('.')[1]) / 60
+            lon = float(line[51:51 + 7].split('.')[0]) + float(line[51:51 + 7].split('.')[1]) / 60
+            all_stations.append(
+                {
+                    'id': line[12:12 + 5].strip(),
+                    'ICAO': line[18:18 + 4] if line[18:18 + 4] != '----' else None,
+                    'name': line[23:23 + 20].strip(),
+                    'latitude': lat,
+                    'longitude': lon,
+                    'altitude': int(line[59:59 + 5]),
+                    'type': line[72:72 + 4]
+                }
+            )
+    return all_stations
+
+
+class ParserTest(unittest.TestCase):
+    def test_matches_legacy_parser(self):
+        stations, errors = parse_stations(CATALOG)
+        self.assertEqual(stations, legacy_parse_stations(CATALOG))
+        self.assertEqual(errors, [])
+
+    def test_bad_lines(self):
+        catalog = CATALOG + [
+            station_line('99999', '----', 'BROKEN', '48,21', '11.47', '446', 'LAND'),
+            station_line('99998', '----', 'BROKEN', '48.21', '11.47', 'n/a', 'LAND')
+        ]
+        stations, errors = parse_stations(catalog)
+        self.assertEqual(len(stations), 4)
+        self.assertEqual([number for number, _ in errors], [8, 9])
+
+    def test_southern_western_positions(self):
+        stations, errors = parse_stations([station_line('85574', 'SCEL', 'SANTIAGO', '-33.23', '-70.47', '474', 'LAND')])
+        self.assertAlmostEqual(stations[0]['latitude'], -33 - 23 / 60)
+        self.assertAlmostEqual(stations[0]['longitude'], -70 - 47 / 60)
+
+    def test_csv(self):
+        with open(os.path.join(TESTDATA, 'stationen.csv'), 'r', encoding='utf-8', newline='') as station_list:
+            stations, errors = parse_stations_csv(station_list)
+        self.assertEqual(errors, [])
+        self.assertEqual(len(stations), 5529)
+        self.assertEqual(stations[0], {
+            'id': '01311', 'ICAO': None, 'name': 'BERGEN', 'latitude': 60.3, 'longitude': 5.22, 'altitude': 50,
+            'type': None
+        })
+        lerwick = next(filter(lambda station: station['id'] == '03005', stations))
+        self.assertEqual(lerwick['longitude'], -1.18)
+        israel = next(filter(lambda station: station['id'] == 'E3234', stations))
+        self.assertIsNone(israel['altitude'])
+
+    def test_csv_bad_lines(self):
+        stations, errors = parse_stations_csv(['01311 BERGEN,"60,30 5,22",50', '01338 VANGSNES,"61,17",51'])
+        self.assertEqual(len(stations), 1)
+        self.assertEqual([number for number, _ in errors], [2])
+
+    def test_weathercodes(self):
+        for code in range(100):
+            self.assertEqual(forecasts.get_present_weather(code), forecasts.get_present_weather(float(code)))
+        self.assertEqual(forecasts.get_present_weather(61), 'slight rain, not freezing, continuous')
+        self.assertEqual(forecasts.get_present_weather(4), '')
+        self.assertEqual(forecasts.get_present_weather(None), '')
+        self.assertEqual(forecasts.get_present_weather(100), '')
+        self.assertEqual(forecasts.get_present_weather(61.5), '')
+        self.assertEqual(forecasts.get_present_weather(float('nan')), '')
+        self.assertEqual(forecasts.get_present_weather(float('inf')), '')
+        self.assertEqual(forecasts.get_present_weather('61'), '')
+        self.assertEqual(len(list(filter(None, forecasts.WEATHER_CODES))), 29)
+
+
+if __name__ == '__main__':
+    unittest.main()